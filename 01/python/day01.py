@@ -3,28 +3,222 @@ Advent of Code 2022 :: Day 1: Calorie Counting
 jramaswami
 """
 
+import heapq
+import mmap
+import os
 
-def main():
-    "Main program."
-    import sys
-    import pyperclip
-    elves = []
+
+CHUNK_SIZE = 1 << 20
+
+
+def read_lines(infile, chunk_size=CHUNK_SIZE):
+    "Yield lines from infile, reading it in large chunks."
+    leftover = ''
+    while True:
+        chunk = infile.read(chunk_size)
+        if not chunk:
+            break
+        lines = (leftover + chunk).split('\n')
+        leftover = lines.pop()
+        yield from lines
+    if leftover:
+        yield leftover
+
+
+def elf_totals(lines):
+    "Yield the total calories carried by each elf."
     curr_calories = 0
-    for line in sys.stdin:
+    for line in lines:
         line = line.strip()
         if line:
             curr_calories += int(line)
         else:
-            elves.append(curr_calories)
+            yield curr_calories
             curr_calories = 0
-    elves.append(curr_calories)   # Last elf.
+    yield curr_calories   # Last elf.
+
+
+class TopK:
+    "Keep the k largest totals seen so far in a bounded heap."
+
+    def __init__(self, k=3):
+        self.k = k
+        self.heap = []
+
+    def add(self, total):
+        "Add a total to the aggregator."
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, total)
+        elif total > self.heap[0]:
+            heapq.heapreplace(self.heap, total)
+
+    def extend(self, totals):
+        "Add every total from an iterable."
+        for total in totals:
+            self.add(total)
+        return self
+
+    def max(self):
+        "Return the largest total."
+        return max(self.heap)
+
+    def sum(self):
+        "Return the sum of the k largest totals."
+        return sum(self.heap)
+
+
+def solve(lines, k=3):
+    "Return the maximum and the top k sum in one pass over lines."
+    top = TopK(k).extend(elf_totals(lines))
+    return top.max(), top.sum()
+
+
+def chunk_bounds(mm, chunk_size):
+    "Return (start, end) offsets splitting mm into chunks at line breaks."
+    bounds = []
+    start = 0
+    while start < len(mm):
+        end = mm.find(b'\n', start + chunk_size)
+        end = len(mm) if end < 0 else end + 1
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def solve_chunk(args):
+    """
+    Sum the groups in one chunk of a file.
+
+    Returns (head, top, tail, has_break) where head and tail are the
+    possibly partial groups at the start and end of the chunk and top
+    holds the k largest complete groups in between.  If the chunk has no
+    blank line then head is the whole chunk and tail is unused.
+    """
+    filename, start, end, k = args
+    with open(filename, 'rb') as infile:
+        with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = mm[start:end]
+    lines = data.split(b'\n')
+    if data.endswith(b'\n'):
+        lines.pop()
+    totals = elf_totals(lines)
+    head = next(totals)
+    top = TopK(k)
+    tail = None
+    for total in totals:
+        if tail is not None:
+            top.add(tail)
+        tail = total
+    return head, top.heap, tail, tail is not None
 
-    soln_a = max(elves)
+
+def solve_file(filename, k=3, chunk_size=CHUNK_SIZE * 16, workers=None):
+    """
+    Return the maximum and the top k sum for a file, summing chunks of
+    the memory mapped file in a process pool and merging the partial
+    groups at the seams.
+    """
+    import concurrent.futures
+    if os.path.getsize(filename) == 0:
+        return solve([], k)
+    with open(filename, 'rb') as infile:
+        with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            bounds = chunk_bounds(mm, chunk_size)
+    jobs = [(filename, start, end, k) for start, end in bounds]
+    top = TopK(k)
+    carry = 0
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        for head, heap, tail, has_break in executor.map(solve_chunk, jobs):
+            if has_break:
+                top.add(carry + head)
+                top.extend(heap)
+                carry = tail
+            else:
+                carry += head
+    top.add(carry)   # Last elf.
+    return top.max(), top.sum()
+
+
+#
+# Testing
+#
+
+
+def test_solve():
+    "Test solve()."
+    with open('../test.txt') as infile:
+        assert solve(read_lines(infile)) == (24000, 45000)
+
+
+def test_read_lines():
+    "Test that read_lines() is not affected by chunk boundaries."
+    with open('../test.txt') as infile:
+        expected = infile.read().splitlines()
+    for chunk_size in (1, 3, 7, 1024):
+        with open('../test.txt') as infile:
+            assert list(read_lines(infile, chunk_size)) == expected
+
+
+def test_solve_file():
+    "Test that solve_file() is not affected by chunk boundaries."
+    for chunk_size in (1, 4, 6, 13, 1024):
+        result = solve_file('../test.txt', chunk_size=chunk_size, workers=2)
+        assert result == (24000, 45000)
+
+
+def test_top_k():
+    "Test TopK with various values of k."
+    with open('../test.txt') as infile:
+        totals = list(elf_totals(infile))
+    for k in range(1, len(totals) + 2):
+        top = TopK(k).extend(totals)
+        assert top.max() == 24000
+        assert top.sum() == sum(sorted(totals)[-k:])
+
+
+#
+# Benchmark
+#
+
+
+def benchmark(sizes=(10_000, 100_000, 1_000_000)):
+    "Show that peak memory stays flat as the number of elves grows."
+    import random
+    import tempfile
+    import time
+    import tracemalloc
+    for n in sizes:
+        with tempfile.TemporaryFile('w+') as infile:
+            for _ in range(n):
+                for _ in range(random.randint(1, 5)):
+                    infile.write(f"{random.randint(1, 10000)}\n")
+                infile.write('\n')
+            infile.seek(0)
+            tracemalloc.start()
+            start = time.perf_counter()
+            solve(read_lines(infile))
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        print(f"{n:>9} elves: {elapsed:.3f}s, peak {peak / 1024:.0f} KiB")
+
+
+#
+# Main
+#
+
+
+def main():
+    "Main program."
+    import sys
+    import pyperclip
+    if len(sys.argv) > 1:
+        soln_a, soln_b = solve_file(sys.argv[1])
+    else:
+        soln_a, soln_b = solve(read_lines(sys.stdin))
     assert soln_a == 70613
     print(f"The maximum calories carried by an elf is {soln_a}")
 
-    elves.sort()
-    soln_b = sum(elves[-3:])
     assert soln_b == 205805
     pyperclip.copy(str(soln_b))
     print(f"The top three elves are carrying {soln_b} calories.")
@@ -32,4 +226,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
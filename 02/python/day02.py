@@ -67,6 +67,73 @@ def guide_tournament(lines):
     return sum(guide_round(line) for line in lines)
 
 
+# Key = b'<foe> <code>', Value = (part a score, part b score)
+SCORE_TABLE = {
+    f'{foe} {code}'.encode(): (
+        run_round(f'{foe} {code}'), guide_round(f'{foe} {code}')
+    )
+    for foe in 'ABC' for code in 'XYZ'
+}
+
+
+def count_patterns(buffer):
+    """
+    Return the number of rounds of each pattern in buffer, using one
+    bytes.count scan per pattern.  Raise ValueError if the buffer holds
+    anything other than well formed rounds.
+    """
+    counts = {pattern: buffer.count(pattern) for pattern in SCORE_TABLE}
+    whitespace = sum(buffer.count(c) for c in (b' ', b'\t', b'\r', b'\n'))
+    # Every round is exactly two letters.
+    if 2 * sum(counts.values()) != len(buffer) - whitespace:
+        raise ValueError("Buffer contains rounds that are not recognised.")
+    return counts
+
+
+def score_buffer(buffer):
+    "Return the part a and part b scores for a whole buffer of rounds."
+    soln_a = soln_b = 0
+    for pattern, count in count_patterns(buffer).items():
+        score_a, score_b = SCORE_TABLE[pattern]
+        soln_a += count * score_a
+        soln_b += count * score_b
+    return soln_a, soln_b
+
+
+class Scoreboard:
+    "Running tally of a tournament that rounds can be appended to."
+
+    def __init__(self):
+        self.counts = {pattern: 0 for pattern in SCORE_TABLE}
+
+    def add_round(self, line):
+        "Add a single round."
+        if isinstance(line, str):
+            line = line.encode()
+        line = line.strip()
+        if line:
+            self.counts[line] += 1
+
+    def add_rounds(self, lines):
+        "Add a batch of rounds, one per line."
+        for line in lines:
+            self.add_round(line)
+
+    def add_buffer(self, buffer):
+        "Add a buffer of rounds.  The buffer must end on a round boundary."
+        for pattern, count in count_patterns(buffer).items():
+            self.counts[pattern] += count
+
+    def totals(self):
+        "Return the part a and part b scores of the rounds seen so far."
+        soln_a = soln_b = 0
+        for pattern, count in self.counts.items():
+            score_a, score_b = SCORE_TABLE[pattern]
+            soln_a += count * score_a
+            soln_b += count * score_b
+        return soln_a, soln_b
+
+
 def test_1():
     "Test each round of part a tournament."
     expected = [8, 1, 6]
@@ -95,15 +162,52 @@ def test_4():
         assert guide_tournament(infile) == 12
 
 
+def test_5():
+    "Test scoring a whole buffer."
+    with open('../test.txt', 'rb') as infile:
+        assert score_buffer(infile.read()) == (15, 12)
+
+
+def test_count_patterns():
+    "Test counting every pattern in a buffer."
+    buffer = b"A Y\nB X\r\nC Z\nC Z\nA X\n\n"
+    counts = count_patterns(buffer)
+    assert counts[b'A Y'] == counts[b'B X'] == counts[b'A X'] == 1
+    assert counts[b'C Z'] == 2
+    assert sum(counts.values()) == 5
+
+
+def test_invalid_buffer():
+    "Test that unrecognised rounds are rejected."
+    for buffer in (b"A X\nB Q\n", b"A X\nAB Y\n", b"A X\nC\n"):
+        try:
+            score_buffer(buffer)
+        except ValueError:
+            pass
+        else:
+            assert False, f"{buffer!r} was accepted"
+
+
+def test_6():
+    "Test incremental updates to the scoreboard."
+    expected = [(8, 4), (9, 5), (15, 12)]
+    scoreboard = Scoreboard()
+    with open('../test.txt') as infile:
+        for i, line in enumerate(infile):
+            scoreboard.add_round(line)
+            assert scoreboard.totals() == expected[i]
+    with open('../test.txt', 'rb') as infile:
+        scoreboard.add_buffer(infile.read())
+    assert scoreboard.totals() == (30, 24)
+
+
 def main():
     "Main program."
     import pyperclip
-    with open('../input02.txt') as infile:
-        lines = infile.readlines()
-        soln_a = run_tournament(lines)
+    with open('../input02.txt', 'rb') as infile:
+        soln_a, soln_b = score_buffer(infile.read())
         assert soln_a == 8890
         print(f"Your total score (if everything goes as planned) is {soln_a}.")
-        soln_b = guide_tournament(lines)
         assert soln_b == 10238
         print(f"Your total score (if you play the strategy) is {soln_b}.")
         pyperclip.copy(str(soln_b))
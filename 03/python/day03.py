@@ -10,6 +10,10 @@ import string
 ITEM_PRIORITIES = {c: i+1 for i, c in enumerate(string.ascii_letters)}
 
 
+# Bit i of a mask is set when the item with priority i+1 is present.
+ITEM_BITS = {c: 1 << i for i, c in enumerate(string.ascii_letters)}
+
+
 def read_rucksacks(filename):
     "Read rucksacks from the given file."
     rucksacks = []
@@ -30,8 +34,40 @@ def get_compartment_overlap(rucksack):
     return list(overlap)[0]
 
 
-def solve_a(rucksacks):
+def to_mask(items):
+    "Encode a collection of items as a 52 bit mask."
+    mask = 0
+    for c in items:
+        mask |= ITEM_BITS[c]
+    return mask
+
+
+def encode_rucksack(rucksack):
+    "Return (left, right, whole) masks for a rucksack."
+    mid = len(rucksack) // 2
+    left = to_mask(rucksack[:mid])
+    right = to_mask(rucksack[mid:])
+    return left, right, left | right
+
+
+def encode_rucksacks(rucksacks):
+    "Encode a list of rucksacks as masks."
+    return [encode_rucksack(r) for r in rucksacks]
+
+
+def mask_priority(mask):
+    "Return the priority of the single item in the mask."
+    assert mask and mask & (mask - 1) == 0
+    return mask.bit_length()
+
+
+def solve_a(masks):
     "Solve part a of puzzle."
+    return sum(mask_priority(left & right) for left, right, _ in masks)
+
+
+def solve_a_sets(rucksacks):
+    "Solve part a of puzzle using sets."
     return sum(ITEM_PRIORITIES[get_compartment_overlap(r)] for r in rucksacks)
 
 
@@ -50,11 +86,41 @@ def get_badges(rucksacks):
     return badges
 
 
-def solve_b(rucksacks):
+def solve_b(masks):
     "Solve part b of puzzle."
+    return sum(
+        mask_priority(a[2] & b[2] & c[2])
+        for a, b, c in zip(masks[::3], masks[1::3], masks[2::3])
+    )
+
+
+def solve_b_sets(rucksacks):
+    "Solve part b of puzzle using sets."
     return sum(ITEM_PRIORITIES[b] for b in get_badges(rucksacks))
 
 
+def stream_rucksacks(infile):
+    "Yield rucksack masks from a file object one line at a time."
+    for line in infile:
+        line = line.strip()
+        if line:
+            yield encode_rucksack(line)
+
+
+def solve_stream(masks):
+    "Solve parts a and b in a single pass over an iterable of masks."
+    soln_a = soln_b = 0
+    badge = -1
+    for i, (left, right, whole) in enumerate(masks, start=1):
+        soln_a += mask_priority(left & right)
+        badge &= whole
+        if i % 3 == 0:
+            soln_b += mask_priority(badge)
+            badge = -1
+    assert badge == -1
+    return soln_a, soln_b
+
+
 #
 # Testing
 #
@@ -78,7 +144,8 @@ def test_rucksack_priority():
 def test_solve_a():
     rucksacks = read_rucksacks('../test.txt')
     expected = 157
-    assert solve_a(rucksacks) == expected
+    assert solve_a_sets(rucksacks) == expected
+    assert solve_a(encode_rucksacks(rucksacks)) == expected
 
 
 def test_get_badges():
@@ -90,7 +157,68 @@ def test_get_badges():
 def test_solve_b():
     rucksacks = read_rucksacks('../test.txt')
     expected = 70
-    assert solve_b(rucksacks) == expected
+    assert solve_b_sets(rucksacks) == expected
+    assert solve_b(encode_rucksacks(rucksacks)) == expected
+
+
+def test_mask_priority():
+    rucksacks = read_rucksacks('../test.txt')
+    expected = [16, 38, 42, 22, 20, 19]
+    for r, e in zip(rucksacks, expected):
+        left, right, _ = encode_rucksack(r)
+        assert mask_priority(left & right) == e
+
+
+def test_solve_stream():
+    with open('../test.txt') as infile:
+        assert solve_stream(stream_rucksacks(infile)) == (157, 70)
+
+
+#
+# Benchmark
+#
+
+
+def make_rucksacks(n):
+    "Return n random rucksacks, grouped so that every puzzle rule holds."
+    import random
+    letters = list(string.ascii_letters)
+    rucksacks = []
+    for _ in range(n // 3):
+        random.shuffle(letters)
+        badge = letters[0]
+        for i in range(3):
+            # Each rucksack in the group draws from its own pool.
+            pool = letters[1+17*i:18+17*i]
+            random.shuffle(pool)
+            size = random.randint(4, 8)
+            shared = pool[0]
+            left = [badge] + pool[1:size]
+            right = pool[size:2*size]
+            if random.random() < 0.5:
+                left, right = right, left
+            left.append(shared)
+            right.append(shared)
+            rucksacks.append(''.join(left) + ''.join(right))
+    return rucksacks
+
+
+def benchmark(n=1_000_000):
+    "Compare the mask and set based solutions on n random rucksacks."
+    import time
+    rucksacks = make_rucksacks(n)
+
+    start = time.perf_counter()
+    expected = solve_a_sets(rucksacks), solve_b_sets(rucksacks)
+    elapsed = time.perf_counter() - start
+    print(f"sets:  {elapsed:.3f}s")
+
+    start = time.perf_counter()
+    masks = encode_rucksacks(rucksacks)
+    result = solve_a(masks), solve_b(masks)
+    elapsed = time.perf_counter() - start
+    print(f"masks: {elapsed:.3f}s")
+    assert result == expected
 
 
 #
@@ -100,11 +228,10 @@ def test_solve_b():
 
 def main():
     import pyperclip
-    rucksacks = read_rucksacks('../input03.txt')
-    soln_a = solve_a(rucksacks)
+    with open('../input03.txt') as infile:
+        soln_a, soln_b = solve_stream(stream_rucksacks(infile))
     assert soln_a == 7716
     print(f"The solution to part A is {soln_a}.")
-    soln_b = solve_b(rucksacks)
     assert soln_b == 2973
     print(f"The solution to part B is {soln_b}.")
     pyperclip.copy(str(soln_b))
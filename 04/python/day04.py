@@ -4,6 +4,13 @@ Day 4: Camp Cleanup
 jramaswami
 """
 
+import array
+import bisect
+import operator
+
+
+SEPARATORS = str.maketrans('-,', '  ')
+
 
 def parse_pair_assignment(assignment):
     "Parse a pair assignment into a tuple."
@@ -24,6 +31,19 @@ def read_input(filename):
     return pair_assignments
 
 
+def read_columns(filename):
+    """
+    Read input file in bulk and return the four columns (a0, a1, b0, b1)
+    of the pair assignments as integer arrays.
+    """
+    with open(filename) as infile:
+        text = infile.read()
+    tokens = text.translate(SEPARATORS).split()
+    values = array.array('q', map(int, tokens))
+    assert len(values) % 4 == 0
+    return tuple(values[i::4] for i in range(4))
+
+
 def fully_contains(pair_assignment):
     "Return True if one section assignment contains the other."
     a, b = pair_assignment
@@ -38,6 +58,16 @@ def solve_a(pair_assignments):
     return sum(fully_contains(p) for p in pair_assignments)
 
 
+def count_fully_contains(columns):
+    "Solve part a of puzzle over columns from read_columns()."
+    a0, a1, b0, b1 = columns
+    a_contains_b = map(operator.and_, map(operator.le, a0, b0),
+                       map(operator.le, b1, a1))
+    b_contains_a = map(operator.and_, map(operator.le, b0, a0),
+                       map(operator.le, a1, b1))
+    return sum(map(operator.or_, a_contains_b, b_contains_a))
+
+
 def overlaps(pair_assignment):
     "Return True if segment assignments overlap."
     a, b = pair_assignment
@@ -49,6 +79,87 @@ def solve_b(pair_assignments):
     return sum(overlaps(p) for p in pair_assignments)
 
 
+def count_overlaps(columns):
+    "Solve part b of puzzle over columns from read_columns()."
+    a0, a1, b0, b1 = columns
+    return sum(map(operator.and_, map(operator.ge, a1, b0),
+                   map(operator.ge, b1, a0)))
+
+
+class IntervalIndex:
+    """
+    Static index over the section ranges of pair assignments.
+
+    Elf ranges are kept sorted by start with a max segment tree over
+    their ends, so the k overlapping ranges can be listed in
+    O((k + 1) log n), one root to leaf path per range reported.  Sorted
+    starts and ends answer counting queries in O(log n).
+    """
+
+    def __init__(self, pair_assignments=()):
+        self.pair_assignments = []
+        self.extend(pair_assignments)
+
+    def extend(self, pair_assignments):
+        "Bulk load more pair assignments and rebuild the index."
+        self.pair_assignments.extend(pair_assignments)
+        self.ranges = sorted(
+            (lo, hi, i)
+            for i, pair_assignment in enumerate(self.pair_assignments)
+            for lo, hi in pair_assignment
+        )
+        self.starts = [lo for lo, _, _ in self.ranges]
+        self.ends = sorted(hi for _, hi, _ in self.ranges)
+        self.size = 1
+        while self.size < len(self.ranges):
+            self.size *= 2
+        self.tree = [-1] * (2 * self.size)
+        for j, (_, hi, _) in enumerate(self.ranges):
+            self.tree[self.size + j] = hi
+        for j in range(self.size - 1, 0, -1):
+            self.tree[j] = max(self.tree[2 * j], self.tree[2 * j + 1])
+
+    def overlapping_ranges(self, a, b):
+        "Return the (lo, hi, pair index) ranges that overlap [a, b]."
+        # Only ranges starting at or before b can overlap.
+        limit = bisect.bisect_right(self.starts, b)
+        result = []
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, left, right = stack.pop()
+            if left >= limit or self.tree[node] < a:
+                continue
+            if node >= self.size:
+                result.append(self.ranges[left])
+                continue
+            mid = (left + right) // 2
+            stack.append((2 * node + 1, mid, right))
+            stack.append((2 * node, left, mid))
+        return result
+
+    def overlapping_pairs(self, a, b):
+        "Return the indices of pairs with an elf whose range overlaps [a, b]."
+        return sorted({i for _, _, i in self.overlapping_ranges(a, b)})
+
+    def count_overlapping(self, a, b):
+        "Return the number of elf ranges that overlap [a, b]."
+        ends_before = bisect.bisect_left(self.ends, a)
+        starts_after = len(self.starts) - bisect.bisect_right(self.starts, b)
+        return len(self.starts) - ends_before - starts_after
+
+    def coverage(self, section):
+        "Return the number of elves whose range covers section."
+        return self.count_overlapping(section, section)
+
+    def batch_overlapping_pairs(self, queries):
+        "Answer overlapping_pairs() for each (a, b) in queries."
+        return [self.overlapping_pairs(a, b) for a, b in queries]
+
+    def batch_coverage(self, sections):
+        "Answer coverage() for each section in sections."
+        return [self.coverage(s) for s in sections]
+
+
 #
 # Testing
 #
@@ -84,6 +195,33 @@ def test_4():
     assert solve_b(pair_assignments) == expected
 
 
+def test_5():
+    "Test the column based solutions."
+    columns = read_columns('../test.txt')
+    assert count_fully_contains(columns) == 2
+    assert count_overlaps(columns) == 4
+
+
+def test_6():
+    "Test IntervalIndex against a brute force scan."
+    pair_assignments = read_input('../test.txt')
+    index = IntervalIndex(pair_assignments)
+    for a in range(0, 11):
+        for b in range(a, 11):
+            expected = [
+                i for i, pair_assignment in enumerate(pair_assignments)
+                if any(overlaps(((a, b), r)) for r in pair_assignment)
+            ]
+            assert index.overlapping_pairs(a, b) == expected
+            assert index.count_overlapping(a, b) == sum(
+                overlaps(((a, b), r))
+                for pair_assignment in pair_assignments
+                for r in pair_assignment
+            )
+    expected = [0, 0, 4, 5, 7, 7, 8, 6, 4, 1, 0]
+    assert index.batch_coverage(range(11)) == expected
+
+
 #
 # Main
 #
@@ -92,11 +230,11 @@ def test_4():
 def main():
     "Main program."
     import pyperclip
-    pair_assignments = read_input('../input04.txt')
-    soln_a = solve_a(pair_assignments)
+    columns = read_columns('../input04.txt')
+    soln_a = count_fully_contains(columns)
     assert soln_a == 498
     print(f"{soln_a} assignment pairs have one range fully containing the other.")
-    soln_b = solve_b(pair_assignments)
+    soln_b = count_overlaps(columns)
     assert soln_b == 859
     print(f"{soln_b} assignment pairs have ranges that overlap.")
     pyperclip.copy(str(soln_b))
@@ -4,6 +4,7 @@ Day 5: Supply Stacks
 jramaswami
 """
 
+import array
 import string
 
 
@@ -49,33 +50,105 @@ def parse_instruction(instruction):
     return tuple(int(tokens[t]) for t in [1, 3, 5])
 
 
+def compile_instructions(instructions):
+    "Compile instructions into a packed array of count, source, sink."
+    program = array.array('l')
+    for instruction in instructions:
+        if instruction.strip():
+            program.extend(parse_instruction(instruction))
+    return program
+
+
+def move_a(stacks, count, source, sink):
+    "Move count crates one at a time from source to sink."
+    stack = stacks[source-1]
+    assert 0 <= count <= len(stack)
+    split = len(stack) - count
+    stacks[sink-1].extend(reversed(stack[split:]))
+    del stack[split:]
+
+
+def move_b(stacks, count, source, sink):
+    "Move count crates at once from source to sink."
+    stack = stacks[source-1]
+    assert 0 <= count <= len(stack)
+    split = len(stack) - count
+    stacks[sink-1].extend(stack[split:])
+    del stack[split:]
+
+
 def tick_a(stacks, instruction):
     "Perform one tick (instruction) of simulation a."
-    count, source, sink = parse_instruction(instruction)
-    for _ in range(count):
-        stacks[sink-1].append(stacks[source-1].pop())
+    move_a(stacks, *parse_instruction(instruction))
 
 
 def tick_b(stacks, instruction):
     "Perform one tick (instruction) of simulation b."
-    count, source, sink = parse_instruction(instruction)
-    stacks[sink-1].extend(stacks[source-1][-count:])
-    stacks[source-1] = stacks[source-1][:-count]
+    move_b(stacks, *parse_instruction(instruction))
+
+
+# Tick and move functions for each crane model, by puzzle part.
+CRANES = {'a': (tick_a, move_a), 'b': (tick_b, move_b)}
+
+
+class Checkpoints:
+    """
+    Snapshots of the stacks taken every few ticks of a simulation.
+
+    Snapshots are immutable tuples so they are never disturbed by the
+    simulation that recorded them.  The state at any tick is found by
+    restoring the nearest earlier snapshot and replaying the rest of the
+    compiled program with the same crane model that recorded it.
+    """
+
+    def __init__(self, stacks, instructions, part, every=1000):
+        self.program = compile_instructions(instructions)
+        self.tick_fn, self.move_fn = CRANES[part]
+        self.every = every
+        self.snapshots = [tuple(tuple(s) for s in stacks)]
+
+    def record(self, tick, stacks):
+        "Record the stacks as they are before the given tick."
+        # Snapshot zero is taken from the initial stacks when created.
+        if tick % self.every == 0 and tick > 0:
+            self.snapshots.append(tuple(tuple(s) for s in stacks))
+
+    def state_at(self, tick):
+        "Return the stacks as they are after the given number of ticks."
+        assert 0 <= tick <= len(self.program) // 3
+        base = min(tick // self.every, len(self.snapshots) - 1)
+        stacks = [list(s) for s in self.snapshots[base]]
+        start = base * self.every
+        return run_program(stacks, self.program[3*start:3*tick], self.move_fn)
+
+
+def simulate(stacks, instructions, tick_fn, checkpoints=None):
+    """
+    Simulate with the given tick function.  If checkpoints is given the
+    stacks are recorded into it as the simulation runs.
+    """
+    assert checkpoints is None or checkpoints.tick_fn is tick_fn
+    for tick, instruction in enumerate(instructions):
+        if checkpoints is not None:
+            checkpoints.record(tick, stacks)
+        tick_fn(stacks, instruction)
+    return stacks
 
 
-def simulate(stacks, instructions, tick_fn):
-    "Simulate with the given tick function."
-    for instruction in instructions:
-        tick_fn(stacks, instruction)
+def run_program(stacks, program, move_fn):
+    "Simulate a compiled program with the given move function."
+    it = iter(program)
+    for count, source, sink in zip(it, it, it):
+        move_fn(stacks, count, source, sink)
     return stacks
 
 
 def solve(lines, part):
     "Solve the given part of the puzzle."
-    tick_fn = (tick_a if part == 'a' else tick_b)
+    move_fn = (move_a if part == 'a' else move_b)
     stack_lines, instructions = partition_file(lines)
     stacks = parse_stacks(stack_lines)
-    simulate(stacks, instructions, tick_fn)
+    run_program(stacks, compile_instructions(instructions), move_fn)
     return "".join(s[-1] for s in stacks)
 
 
@@ -147,6 +220,66 @@ def test_solve_b():
     assert solve(lines, 'b') == 'MCD'
 
 
+def test_move_edge_cases():
+    for move_fn in (move_a, move_b):
+        stacks = [['A', 'B'], ['C']]
+        move_fn(stacks, 0, 1, 2)
+        assert stacks == [['A', 'B'], ['C']]
+        move_fn(stacks, 2, 1, 2)
+        assert sorted(stacks[1]) == ['A', 'B', 'C'] and stacks[0] == []
+        try:
+            move_fn(stacks, 1, 1, 2)
+        except AssertionError:
+            pass
+        else:
+            assert False, "moved more crates than the stack holds"
+
+
+def test_run_program():
+    lines = read_file('../test.txt')
+    stack_lines, instructions = partition_file(lines)
+    program = compile_instructions(instructions)
+    assert list(program) == [1, 2, 1, 3, 1, 3, 2, 2, 1, 1, 1, 2]
+    for part, move_fn in (('a', move_a), ('b', move_b)):
+        stacks = parse_stacks(stack_lines)
+        run_program(stacks, program, move_fn)
+        expected = parse_stacks(read_file(f"../tick4_{part}.txt"))
+        assert stacks == expected
+
+
+def test_checkpoints():
+    lines = read_file('../test.txt')
+    stack_lines, instructions = partition_file(lines)
+    for part, (tick_fn, _) in CRANES.items():
+        for every in (1, 2, 3, 10):
+            stacks = parse_stacks(stack_lines)
+            checkpoints = Checkpoints(stacks, instructions, part, every)
+            # The initial state is available before simulating.
+            assert checkpoints.state_at(0) == parse_stacks(stack_lines)
+            assert checkpoints.state_at(4) == parse_stacks(
+                read_file(f"../tick4_{part}.txt"))
+            simulate(stacks, instructions, tick_fn, checkpoints)
+            assert checkpoints.state_at(0) == parse_stacks(stack_lines)
+            for i in range(1, 5):
+                expected = parse_stacks(read_file(f"../tick{i}_{part}.txt"))
+                assert checkpoints.state_at(i) == expected
+    stacks = parse_stacks(stack_lines)
+    assert Checkpoints(stacks, [], 'a').state_at(0) == stacks
+
+
+def test_checkpoints_crane_mismatch():
+    lines = read_file('../test.txt')
+    stack_lines, instructions = partition_file(lines)
+    stacks = parse_stacks(stack_lines)
+    checkpoints = Checkpoints(stacks, instructions, 'a')
+    try:
+        simulate(stacks, instructions, tick_b, checkpoints)
+    except AssertionError:
+        pass
+    else:
+        assert False, "simulate() accepted the wrong crane"
+
+
 def main():
     "Main program."
     import pyperclip
@@ -13,8 +13,8 @@ def all_different(window):
     return len(set(window)) == len(window)
 
 
-def solve(buffer, window_size):
-    "Solve puzzle for given window size."
+def solve_deque(buffer, window_size):
+    "Solve puzzle for given window size using a deque window."
     window = collections.deque()
     for i, c in enumerate(buffer):
         window.append(c)
@@ -25,6 +25,81 @@ def solve(buffer, window_size):
     assert False
 
 
+class MarkerDetector:
+    """
+    Detect markers for several window sizes in a single pass.
+
+    The detector tracks the start of the longest run of distinct
+    characters ending at the current position using the index at which
+    each character was last seen, so each character costs O(1) per
+    window size.  Input may be fed in pieces.
+    """
+
+    def __init__(self, window_sizes):
+        self.window_sizes = sorted(window_sizes)
+        self.last_seen = {}
+        self.start = 0
+        self.offset = 0
+
+    def feed(self, buffer):
+        "Yield (window size, marker position) for every marker in buffer."
+        last_seen = self.last_seen
+        start = self.start
+        end = self.offset + len(buffer)
+        for i, c in enumerate(buffer, start=self.offset):
+            prev = last_seen.get(c, -1)
+            if prev >= start:
+                start = prev + 1
+            last_seen[c] = i
+            run = i - start + 1
+            for window_size in self.window_sizes:
+                if window_size > run:
+                    break
+                # Save the state first in case the caller stops here.
+                self.start = start
+                self.offset = i + 1
+                yield window_size, i + 1
+        self.start = start
+        self.offset = end
+
+
+def markers(buffer, window_sizes):
+    "Yield (window size, marker position) for every marker in buffer."
+    yield from MarkerDetector(window_sizes).feed(buffer)
+
+
+def scan(infile, window_sizes=(4, 14), chunk_size=1 << 16, find_all=False):
+    """
+    Yield (window size, marker position) from a binary file object read
+    in fixed size chunks.  Line endings are not part of the datastream
+    and are skipped.  Unless find_all is True only the first marker for
+    each window size is reported and reading stops once all have been
+    found.
+    """
+    detector = MarkerDetector(window_sizes)
+    pending = set(window_sizes)
+    while pending:
+        chunk = infile.read(chunk_size)
+        if not chunk:
+            break
+        chunk = chunk.translate(None, b'\r\n')
+        for window_size, posn in detector.feed(chunk):
+            if find_all:
+                yield window_size, posn
+            elif window_size in pending:
+                pending.remove(window_size)
+                yield window_size, posn
+                if not pending:
+                    break
+
+
+def solve(buffer, window_size):
+    "Solve puzzle for given window size."
+    for _, posn in markers(buffer, [window_size]):
+        return posn
+    assert False
+
+
 #
 # Testing
 #
@@ -57,15 +132,70 @@ def test_2():
         assert solve(buffer, 14) == expected[i]
 
 
+def test_3():
+    test_buffers = [
+        "mjqjpqmgbljsphdztnvjfqwrcgsmlb",
+        "bvwbjplbgvbhsrlpgdmjqwftvncz",
+        "nppdvjthqldpwncqszvftbrmjlhg",
+        "nznrnfrfntjfmvfwmzdfjlvtqnbhcprsg",
+        "zcfzfwzzqfrljwzlrfnpqdbhtmscgvjw"
+    ]
+    for buffer in test_buffers:
+        for window_size in (4, 14):
+            expected = solve_deque(buffer, window_size)
+            assert solve(buffer, window_size) == expected
+        expected = [
+            (w, i) for i in range(1, len(buffer) + 1) for w in (1, 4, 14)
+            if i >= w and all_different(buffer[i-w:i])
+        ]
+        assert list(markers(buffer, [14, 1, 4])) == expected
+
+
+def test_4():
+    import io
+    buffer = b"mjqjpqmgbljsphdztnvjfqwrcgsmlb"
+    expected = list(markers(buffer, [4, 14]))
+    for chunk_size in (1, 2, 5, 64):
+        infile = io.BytesIO(buffer)
+        result = list(scan(infile, chunk_size=chunk_size))
+        assert result == [(4, 7), (14, 19)]
+        infile = io.BytesIO(buffer)
+        result = list(scan(infile, chunk_size=chunk_size, find_all=True))
+        assert result == expected
+
+
+def test_5():
+    import io
+    # A trailing newline is not a datastream character.
+    assert list(scan(io.BytesIO(b'abc\n'), (4,))) == []
+    assert list(scan(io.BytesIO(b'abc\r\n'), (4,), find_all=True)) == []
+    # Nor are line endings inside a capture file.
+    buffer = b"mjqjpqmgbljsphdztnvjfqwrcgsmlb"
+    expected = list(markers(buffer, [4, 14]))
+    split = b"\n".join(buffer[i:i+7] for i in range(0, len(buffer), 7))
+    for chunk_size in (1, 3, 64):
+        infile = io.BytesIO(split + b"\r\n")
+        result = list(scan(infile, chunk_size=chunk_size, find_all=True))
+        assert result == expected
+
+
+def test_6():
+    detector = MarkerDetector([4])
+    markers_abcd = detector.feed('abcd')
+    assert next(markers_abcd) == (4, 4)
+    assert list(detector.feed('e')) == [(4, 5)]
+    assert list(detector.feed('ae')) == [(4, 6)]
+
+
 def main():
     "Main program."
     import pyperclip
-    with open('../input06.txt') as infile:
-        buffer = infile.readline().strip()
-    soln_a = solve(buffer, 4)
+    with open('../input06.txt', 'rb') as infile:
+        first = dict(scan(infile))
+    soln_a = first[4]
     assert soln_a == 1134
     print(f"The solution to part A is {soln_a}.")
-    soln_b = solve(buffer, 14)
+    soln_b = first[14]
     assert soln_b == 2263
     print(f"The solution to part B is {soln_b}.")
     pyperclip.copy(str(soln_b))
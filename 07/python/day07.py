@@ -4,29 +4,98 @@ Day 7: No Space Left On Device
 jramaswami
 """
 
+import bisect
+
 
 class Node:
 
+    __slots__ = ('name', 'size', 'children', 'type', 'parent', 'path',
+                 'index', 'names')
+
     DIR = 0
     FILE = 1
 
     def __init__(self, name, node_type=DIR, size=-1):
         self.name = name
         self.size = size
-        self.children = []
+        self.children = {} if node_type == Node.DIR else None
         self.type = node_type
+        self.parent = None
+        self.path = name
+        # Indexes shared by the whole tree: path -> node, and a bucket of
+        # nodes for each name as name -> {path: node}.
+        self.index = None
+        self.names = None
 
     def get_child(self, child_name):
-        for child in self.children:
-            if child.name == child_name:
-                return child
+        return self.children.get(child_name)
 
     def add_child(self, child):
-        self.children.append(child)
+        if child.name in self.children:
+            # Replace the existing child, taking its size off first.
+            self.remove_child(child.name)
+        self.children[child.name] = child
+        child.parent = self
+        if self.index is None:
+            self.index = {self.path: self}
+            self.names = {self.name: {self.path: self}}
+        if child.type == Node.DIR and child.children:
+            # Re-root an existing subtree under this directory.
+            nodes, _, parents = flatten_tree(child)
+            for node, parent in zip(nodes, parents):
+                self.register(node, self if parent < 0 else nodes[parent])
+        else:
+            self.register(child, self)
+        if self.size >= 0:
+            self.update_size(child.get_size())
+
+    def register(self, node, parent):
+        "Set the path of node under parent and add it to the tree index."
+        node.path = parent.path + node.name
+        if node.type == Node.DIR:
+            node.path += '/'
+        node.index = self.index
+        node.names = self.names
+        self.index[node.path] = node
+        self.names.setdefault(node.name, {})[node.path] = node
+
+    def remove_child(self, child_name):
+        child = self.children.pop(child_name)
+        child.parent = None
+        removed, _, _ = flatten_tree(child)
+        for node in removed:
+            del self.index[node.path]
+            bucket = self.names[node.name]
+            del bucket[node.path]
+            if not bucket:
+                del self.names[node.name]
+            node.index = None
+            node.names = None
+        if self.size >= 0:
+            self.update_size(-child.get_size())
+        return child
+
+    def resize(self, size):
+        "Change the size of a file."
+        assert self.type == Node.FILE
+        delta = size - self.size
+        self.size = size
+        if self.parent is not None:
+            self.parent.update_size(delta)
+
+    def update_size(self, delta):
+        """
+        Add delta to the cached size of this directory and its ancestors.
+        Sizes that have not been computed yet are left alone.
+        """
+        node = self
+        while node is not None and node.size >= 0:
+            node.size += delta
+            node = node.parent
 
     def get_size(self):
         if self.size < 0:
-            self.size = sum(c.get_size() for c in self.children)
+            tree_sizes(self)
         return self.size
 
     def __repr__(self):
@@ -34,56 +103,168 @@ class Node:
 
 
 def find_node(root, node_name):
-    "Return node with given node_name."
+    """
+    Return the first node in pre-order under root with given node_name.
+    The name may also be a full path such as '/a/e/' for a directory or
+    '/a/e/i' for a file, which is looked up in the tree index.
+    """
+    if '/' in node_name:
+        if root.index is None:
+            node = root if root.path == node_name else None
+        else:
+            node = root.index.get(node_name)
+        if node is not None and node.path.startswith(root.path):
+            return node
+        return None
+
+    if root.names is not None:
+        bucket = root.names.get(node_name, {})
+        matches = [
+            node for path, node in bucket.items()
+            if path.startswith(root.path)
+        ]
+        if len(matches) < 2:
+            return matches[0] if matches else None
 
-    def find_node0(node):
-        "Internal helper fn to recursively search for node."
+    # Several matches: search for the first one in pre-order.
+    stack = [root]
+    while stack:
+        node = stack.pop()
         if node.name == node_name:
             return node
-
+        if node.type == Node.DIR:
+            stack.extend(reversed(node.children.values()))
+    return None
+
+
+def flatten_tree(root):
+    """
+    Return (nodes, levels, parents) for the tree in pre-order, where
+    parents holds the position of each node's parent in nodes.
+    """
+    nodes, levels, parents = [], [], []
+    stack = [(root, 0, -1)]
+    while stack:
+        node, level, parent = stack.pop()
+        posn = len(nodes)
+        nodes.append(node)
+        levels.append(level)
+        parents.append(parent)
+        if node.type == Node.DIR:
+            # Push in reverse so children come out in insertion order.
+            for child in reversed(node.children.values()):
+                stack.append((child, level + 1, posn))
+    return nodes, levels, parents
+
+
+def tree_sizes(root):
+    """
+    Return (nodes, levels, sizes) with the total size of every node in
+    pre-order.  Sizes are accumulated in a single pass over the nodes in
+    reverse pre-order, which visits every child before its parent, and
+    are cached on the directory nodes.
+    """
+    nodes, levels, parents = flatten_tree(root)
+    sizes = [0] * len(nodes)
+    for posn in range(len(nodes) - 1, -1, -1):
+        node = nodes[posn]
         if node.type == Node.FILE:
-            return None
-
-        for child in node.children:
-            result = find_node0(child)
-            if result:
-                return result
-        return None
-
-    return find_node0(root)
+            sizes[posn] = node.size
+        else:
+            node.size = sizes[posn]
+        if parents[posn] >= 0:
+            sizes[parents[posn]] += sizes[posn]
+    return nodes, levels, sizes
+
+
+def parse_commands(lines):
+    """
+    Yield the transcript one entry at a time as ('cd', name), ('ls',),
+    ('dir', name) or ('file', name, size).  Lines may come from any
+    iterable, including a file object, and are consumed lazily.
+    """
+    for line in lines:
+        tokens = line.split()
+        if not tokens:
+            continue
+        if tokens[0] == '$':
+            yield tuple(tokens[1:])
+        elif tokens[0] == 'dir':
+            yield 'dir', tokens[1]
+        elif tokens[0].isnumeric():
+            yield 'file', tokens[1], int(tokens[0])
 
 
 def parse_tree(lines):
     "Parse the director tree from the input."
     root = Node('/')
     stack = [root]
-    # Skip line that goes to /
-    for line in lines[1:]:
-        tokens = line.strip().split()
-        if tokens[0] == '$' and tokens[1] == 'cd':
-            if tokens[2] == '..':
+    for command in parse_commands(lines):
+        if command[0] == 'cd':
+            if command[1] == '/':
+                del stack[1:]
+            elif command[1] == '..':
                 stack.pop()
             else:
-                child = stack[-1].get_child(tokens[2])
+                child = stack[-1].get_child(command[1])
                 stack.append(child)
-        elif tokens[0] == '$' and tokens[1] == 'ls':
-            pass
-        elif tokens[0] == 'dir':
-            stack[-1].add_child(Node(tokens[1], Node.DIR))
-        elif tokens[0].isnumeric():
-            stack[-1].add_child(Node(tokens[1], Node.FILE, int(tokens[0])))
+        elif command[0] == 'dir':
+            if stack[-1].get_child(command[1]) is None:
+                stack[-1].add_child(Node(command[1], Node.DIR))
+        elif command[0] == 'file':
+            if stack[-1].get_child(command[1]) is None:
+                stack[-1].add_child(Node(command[1], Node.FILE, command[2]))
     return root
 
 
+def summarize_tree(lines):
+    """
+    Return a dict of directory path to total size without building the
+    tree, so memory is proportional to the number of directories rather
+    than the number of files.  Directories that are listed more than once
+    are only counted once.
+    """
+    # Path -> [size of files directly inside, parent path]
+    directories = {'/': [0, None]}
+    listed = set()
+    counted = False
+    path = '/'
+    for command in parse_commands(lines):
+        if command[0] == 'cd':
+            counted = False
+            if command[1] == '/':
+                path = '/'
+            elif command[1] == '..':
+                path = directories[path][1]
+            else:
+                child = path + command[1] + '/'
+                directories.setdefault(child, [0, path])
+                path = child
+        elif command[0] == 'ls':
+            counted = path in listed
+            listed.add(path)
+        elif command[0] == 'dir':
+            directories.setdefault(path + command[1] + '/', [0, path])
+        elif command[0] == 'file' and not counted:
+            directories[path][0] += command[2]
+    sizes = {path: own for path, (own, _) in directories.items()}
+    # Children have longer paths than their parents.
+    for path in sorted(directories, key=len, reverse=True):
+        parent = directories[path][1]
+        if parent is not None:
+            sizes[parent] += sizes[path]
+    return sizes
+
+
 def tree_to_lines(node, level, acc):
     "Format tree into lines where left padding indicates level."
-    padding = '  ' * level
-    if node.type == Node.FILE:
-        acc.append((f"{padding}- {node.name} (file, size={node.size})"))
-    else:
-        acc.append((f"{padding} - {node.name} (dir)"))
-        for child in node.children:
-            tree_to_lines(child, level+1, acc)
+    nodes, levels, _ = flatten_tree(node)
+    for node, node_level in zip(nodes, levels):
+        padding = '  ' * (level + node_level)
+        if node.type == Node.FILE:
+            acc.append((f"{padding}- {node.name} (file, size={node.size})"))
+        else:
+            acc.append((f"{padding} - {node.name} (dir)"))
 
 
 def print_tree(root):
@@ -100,44 +281,120 @@ def read_input(filename):
     return lines
 
 
-def solve_a(root):
-    "Return sum of sizes of directories with size of at most 100000"
-
-    def traverse(node):
-        "Internal helper fn to recursively sum 'small' directories."
-        if node.type == Node.FILE:
-            return 0
+def directory_sizes(root):
+    "Return a flat list of the sizes of every directory in the tree."
+    nodes, _, sizes = tree_sizes(root)
+    return [
+        size for node, size in zip(nodes, sizes) if node.type == Node.DIR
+    ]
 
-        return (
-            (node.get_size() if node.get_size() <= 100000 else 0) +
-            sum(traverse(child) for child in node.children)
-        )
 
-    return traverse(root)
+def sum_small_directories(sizes):
+    "Return sum of the directory sizes that are at most 100000."
+    return sum(size for size in sizes if size <= 100000)
 
 
-def solve_b(root):
-    "Find the smallest directory that can be deleted."
+def smallest_directory_to_delete(sizes):
+    "Return the smallest directory size that frees enough space."
     max_capacity = 70000000
     target_space = 30000000
+    # The root contains every other directory.
+    total_used = max(sizes)
+    return min(
+        size for size in sizes
+        if max_capacity - (total_used - size) >= target_space
+    )
 
-    def collect_directories(node, acc):
-        "Internal helper fn to recursively gather directory nodes."
-        if node.type == Node.DIR:
-            acc.append(node)
-            for child in node.children:
-                collect_directories(child, acc)
-
-    directories = []
-    total_used = root.get_size()
-    soln_b = root
-    collect_directories(root, directories)
-    for dir in directories:
-        used_if_deleted = total_used - dir.get_size()
-        if max_capacity - used_if_deleted >= target_space:
-            if dir.get_size() < soln_b.get_size():
-                soln_b = dir
-    return soln_b.get_size()
+
+def solve_a(root):
+    "Return sum of sizes of directories with size of at most 100000"
+    return sum_small_directories(directory_sizes(root))
+
+
+def solve_b(root):
+    "Find the smallest directory that can be deleted."
+    return smallest_directory_to_delete(directory_sizes(root))
+
+
+class DirectoryIndex:
+    """
+    Sorted index of directory sizes that is kept up to date as files are
+    added, removed or resized, so the puzzle questions can be answered
+    without walking the tree.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.sizes = sorted(directory_sizes(root))
+
+    def _ancestors(self, node):
+        "Return the directories from node up to the root."
+        chain = []
+        while node is not None:
+            chain.append(node)
+            node = node.parent
+        return chain
+
+    def _update(self, directory, change):
+        "Apply change() to directory, re-indexing it and its ancestors."
+        chain = self._ancestors(directory)
+        for node in chain:
+            del self.sizes[bisect.bisect_left(self.sizes, node.size)]
+        result = change()
+        for node in chain:
+            bisect.insort(self.sizes, node.size)
+        return result
+
+    def add_file(self, directory, name, size):
+        "Add a file to directory, replacing any child with that name."
+        child = Node(name, Node.FILE, size)
+        existing = directory.get_child(name)
+        if existing is not None and existing.type == Node.DIR:
+            for dir_size in directory_sizes(existing):
+                del self.sizes[bisect.bisect_left(self.sizes, dir_size)]
+        self._update(directory, lambda: directory.add_child(child))
+        return child
+
+    def add_directory(self, directory, name):
+        "Add an empty directory to directory and return it."
+        child = Node(name, Node.DIR, 0)
+        directory.add_child(child)
+        bisect.insort(self.sizes, 0)
+        return child
+
+    def remove_file(self, node):
+        "Remove a file from the tree."
+        assert node.type == Node.FILE
+        directory = node.parent
+        self._update(directory, lambda: directory.remove_child(node.name))
+
+    def resize_file(self, node, size):
+        "Change the size of a file."
+        self._update(node.parent, lambda: node.resize(size))
+
+    def total_used(self):
+        "Return the total size of the tree."
+        return self.root.size
+
+    def sum_at_most(self, limit):
+        "Return the sum of sizes of directories with size at most limit."
+        return sum(self.sizes[:bisect.bisect_right(self.sizes, limit)])
+
+    def smallest_at_least(self, needed):
+        "Return the smallest directory size that is at least needed."
+        posn = bisect.bisect_left(self.sizes, needed)
+        return self.sizes[posn] if posn < len(self.sizes) else None
+
+    def solve_a(self):
+        "Return sum of sizes of directories with size of at most 100000"
+        return self.sum_at_most(100000)
+
+    def solve_b(self):
+        "Find the smallest directory that can be deleted."
+        max_capacity = 70000000
+        target_space = 30000000
+        needed = target_space - (max_capacity - self.total_used())
+        return self.smallest_at_least(needed)
 
 
 #
@@ -169,6 +426,170 @@ def test_3():
     assert solve_b(root) == 24933642
 
 
+def test_4():
+    "Test path lookups."
+    root = parse_tree(read_input('../test.txt'))
+    assert find_node(root, '/') is root
+    assert find_node(root, '/a/e/') is find_node(root, 'e')
+    assert find_node(root, '/a/e/i').size == 584
+    assert find_node(root, '/d/d.log').parent is find_node(root, 'd')
+    assert find_node(root, '/x/') is None
+
+
+def test_5():
+    "Test traversals of a tree too deep to recurse through."
+    import sys
+    root = node = Node('/')
+    depth = sys.getrecursionlimit() * 2
+    for i in range(depth):
+        child = Node(f"d{i}")
+        node.add_child(child)
+        node = child
+    node.add_child(Node('f', Node.FILE, 1))
+    assert directory_sizes(root) == [1] * (depth + 1)
+    assert root.get_size() == 1
+    acc = []
+    tree_to_lines(root, 0, acc)
+    assert len(acc) == depth + 2
+    assert acc[-1] == '  ' * (depth + 1) + '- f (file, size=1)'
+
+
+def test_6():
+    "Test that sizes stay current as files change."
+    root = parse_tree(read_input('../test.txt'))
+    assert root.get_size() == 48381165
+    e = find_node(root, 'e')
+    e.add_child(Node('x', Node.FILE, 16))
+    assert e.get_size() == 600
+    assert root.get_size() == 48381181
+    find_node(root, '/a/e/x').resize(100)
+    assert find_node(root, 'a').get_size() == 94853 + 100
+    e.remove_child('x')
+    assert find_node(root, '/a/e/x') is None
+    assert root.get_size() == 48381165
+
+
+def test_7():
+    "Test DirectoryIndex against a full recomputation."
+    root = parse_tree(read_input('../test.txt'))
+    index = DirectoryIndex(root)
+    assert index.solve_a() == 95437
+    assert index.solve_b() == 24933642
+    e = find_node(root, 'e')
+    x = index.add_file(e, 'x', 5000)
+    new_dir = index.add_directory(root, 'n')
+    index.add_file(new_dir, 'y', 90000)
+    index.resize_file(find_node(root, '/d/k'), 1)
+    index.remove_file(find_node(root, '/b.txt'))
+    index.resize_file(x, 6000)
+    assert index.sizes == sorted(directory_sizes(root))
+    assert index.solve_a() == solve_a(root)
+    assert index.solve_b() == solve_b(root)
+
+
+def test_8():
+    "Test parsing straight from a file object."
+    with open('../test.txt') as infile:
+        root = parse_tree(infile)
+    assert root.get_size() == 48381165
+    assert solve_a(root) == 95437
+
+
+def test_9():
+    "Test summary-only parsing."
+    with open('../test.txt') as infile:
+        sizes = summarize_tree(infile)
+    assert sizes == {
+        '/': 48381165, '/a/': 94853, '/a/e/': 584, '/d/': 24933642
+    }
+    assert sum_small_directories(sizes.values()) == 95437
+    assert smallest_directory_to_delete(sizes.values()) == 24933642
+    # Listing a directory again does not count its files twice.
+    lines = read_input('../test.txt')
+    lines = lines + ['$ cd /\n', '$ ls\n', 'dir a\n', '14848514 b.txt\n']
+    assert summarize_tree(lines) == sizes
+    root = parse_tree(lines)
+    assert sorted(directory_sizes(root)) == sorted(sizes.values())
+
+
+def test_10():
+    "Test that removed nodes leave the index."
+    root = parse_tree(read_input('../test.txt'))
+    d = find_node(root, 'd')
+    d.add_child(Node('i', Node.FILE, 10))
+    find_node(root, 'e').remove_child('i')
+    assert find_node(root, '/a/e/i') is None
+    assert find_node(root, 'i') is find_node(root, '/d/i')
+    assert list(root.names['i']) == ['/d/i']
+    a = root.remove_child('a')
+    for name in ('/a/', '/a/e/', '/a/f', 'a', 'e', 'f', 'h.lst'):
+        assert find_node(root, name) is None
+    assert find_node(root, 'd') is d
+    assert find_node(root, '/d/j').size == 4060174
+    assert a.get_size() == 94853 - 584
+
+
+def test_11():
+    "Test adding a subtree that was built bottom up."
+    root = parse_tree(read_input('../test.txt'))
+    x = Node('x')
+    y = Node('y')
+    y.add_child(Node('g', Node.FILE, 7))
+    x.add_child(y)
+    x.add_child(Node('f', Node.FILE, 5))
+    root.add_child(x)
+    assert find_node(root, '/x/') is x
+    assert find_node(root, '/x/f').size == 5
+    assert find_node(root, '/x/y/g').size == 7
+    assert find_node(root, 'y') is y
+    assert find_node(root, '/x/y/g').index is root.index
+    assert x.get_size() == 12
+
+
+def test_12():
+    "Test removing a subtree and adding it back."
+    root = parse_tree(read_input('../test.txt'))
+    expected = solve_a(root), solve_b(root)
+    a = root.remove_child('a')
+    assert find_node(root, '/a/e/') is None
+    root.add_child(a)
+    assert find_node(root, '/a/e/').name == 'e'
+    assert find_node(root, 'e') is find_node(root, '/a/e/')
+    assert find_node(root, '/a/e/i').size == 584
+    assert (solve_a(root), solve_b(root)) == expected
+
+
+def test_13():
+    "Test that lookups are limited to the given subtree."
+    root = parse_tree(read_input('../test.txt'))
+    d = find_node(root, 'd')
+    assert find_node(d, 'e') is None
+    assert find_node(d, '/a/e/') is None
+    assert find_node(d, 'k') is find_node(root, '/d/k')
+    assert find_node(d, '/d/k') is find_node(root, '/d/k')
+    # Name lookups return the first match in pre-order.
+    a = find_node(root, 'a')
+    a.add_child(Node('j', Node.FILE, 1))
+    assert find_node(root, 'j') is find_node(root, '/a/j')
+
+
+def test_14():
+    "Test that adding a child with an existing name replaces it."
+    root = parse_tree(read_input('../test.txt'))
+    root.get_size()
+    root.add_child(Node('b.txt', Node.FILE, 1))
+    assert root.get_size() == 33532652
+    assert find_node(root, '/b.txt').size == 1
+    root = parse_tree(read_input('../test.txt'))
+    index = DirectoryIndex(root)
+    index.add_file(root, 'b.txt', 1)
+    index.add_file(root, 'a', 2)
+    assert index.sizes == sorted(directory_sizes(root))
+    assert find_node(root, '/a/') is None
+    assert find_node(root, 'e') is None
+    assert root.get_size() == 24933642 + 8504156 + 1 + 2
+
+
 #
 # Main
 #
@@ -177,8 +598,8 @@ def test_3():
 def main():
     "Main program"
     import pyperclip
-    lines = read_input('../input07.txt')
-    root = parse_tree(lines)
+    with open('../input07.txt') as infile:
+        root = parse_tree(infile)
     soln_a = solve_a(root)
     assert soln_a == 1783610
     print(f"The solution to part A is {soln_a}")
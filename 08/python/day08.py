@@ -7,9 +7,14 @@ jramaswami
 
 import math
 import functools
+import itertools
 import operator
 
 
+# Translate ASCII digits into heights 0-9.
+DIGITS = bytes.maketrans(b'0123456789', bytes(range(10)))
+
+
 def get(r, c, grid, default=-math.inf):
     "Helper fn to return grid value or default value if out of bounds."
     if r < 0 or c < 0 or r >= len(grid) or c >= len(grid[0]):
@@ -123,6 +128,89 @@ class TreeGrid:
         return soln_b
 
 
+def visible_from_ends(heights):
+    "Return a flag per tree that is 1 if it is visible from either end."
+    before = itertools.accumulate(heights, max, initial=-1)
+    after = list(itertools.accumulate(reversed(heights), max, initial=-1))
+    after.reverse()
+    return bytes(map(
+        operator.or_,
+        map(operator.gt, heights, before),
+        map(operator.gt, heights, after[1:])
+    ))
+
+
+def viewing_distances(heights):
+    """
+    Return the viewing distance from each tree towards the start of the
+    line.  A stack holds the trees not yet blocked by a taller or equal
+    tree, so each tree is pushed and popped at most once.
+    """
+    distances = []
+    stack = []
+    for i, height in enumerate(heights):
+        while stack and heights[stack[-1]] < height:
+            stack.pop()
+        distances.append(i - stack[-1] if stack else i)
+        stack.append(i)
+    return distances
+
+
+def scenic_scores(rows):
+    """
+    Return the scenic score of every tree and the (r, c) of the tree
+    with the highest score in O(H * W) time.
+    """
+    scores = []
+    for row in rows:
+        left = viewing_distances(row)
+        right = viewing_distances(row[::-1])[::-1]
+        scores.append(list(map(operator.mul, left, right)))
+    for c, col in enumerate(zip(*rows)):
+        up = viewing_distances(col)
+        down = viewing_distances(col[::-1])[::-1]
+        for r, (u, d) in enumerate(zip(up, down)):
+            scores[r][c] *= u * d
+    best = max(
+        ((r, c) for r, row in enumerate(scores) for c in range(len(row))),
+        key=lambda posn: scores[posn[0]][posn[1]]
+    )
+    return scores, best
+
+
+class CompactTreeGrid:
+    """
+    Tree grid that stores each row of heights as bytes, one byte per tree,
+    and computes visibility a whole row or column at a time from running
+    maxima.
+    """
+
+    def __init__(self, input_file_name):
+        with open(input_file_name, 'rb') as infile:
+            self.rows = [
+                line.strip().translate(DIGITS) for line in infile
+                if line.strip()
+            ]
+        self.cols = [bytes(col) for col in zip(*self.rows)]
+
+    def visible(self):
+        "Return rows of flags that are 1 where the tree is visible."
+        visible = [bytearray(visible_from_ends(row)) for row in self.rows]
+        for c, col in enumerate(self.cols):
+            for r, flag in enumerate(visible_from_ends(col)):
+                visible[r][c] |= flag
+        return visible
+
+    def solve_a(self):
+        "Return the count of visible trees."
+        return sum(row.count(1) for row in self.visible())
+
+    def solve_b(self):
+        "Return the maximum scenic score."
+        scores, (r, c) = scenic_scores(self.rows)
+        return scores[r][c]
+
+
 #
 # Testing
 #
@@ -159,6 +247,15 @@ def test_soln_a():
 
 
 
+def test_compact_soln_a():
+    tree_grid = TreeGrid('../test.txt')
+    compact_grid = CompactTreeGrid('../test.txt')
+    assert compact_grid.solve_a() == 21
+    for r, row in enumerate(compact_grid.visible()):
+        for c, flag in enumerate(row):
+            assert flag == tree_grid.is_tree_visible(r, c)
+
+
 def test_visible_trees_in_dir():
     tree_grid = TreeGrid('../test.txt')
     # L, R, U, D
@@ -181,6 +278,16 @@ def test_solve_b():
     assert tree_grid.solve_b() == 8
 
 
+def test_scenic_scores():
+    tree_grid = TreeGrid('../test.txt')
+    scores, best = scenic_scores(tree_grid.tree_grid)
+    for r, row in enumerate(scores):
+        for c, score in enumerate(row):
+            assert score == tree_grid.scenic_score(r, c)
+    assert best == (3, 2)
+    assert CompactTreeGrid('../test.txt').solve_b() == 8
+
+
 #
 # Main
 #
@@ -189,7 +296,7 @@ def test_solve_b():
 def main():
     "Main program."
     import pyperclip
-    tree_grid = TreeGrid('../input08.txt')
+    tree_grid = CompactTreeGrid('../input08.txt')
     soln_a = tree_grid.solve_a()
     assert soln_a == 1538
     print(f"The solution to part A is {soln_a}.")
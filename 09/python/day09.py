@@ -5,6 +5,7 @@ jramaswami
 """
 
 
+import array
 import collections
 
 
@@ -103,6 +104,135 @@ def solve_b(instructions):
     return len(visited)
 
 
+# Offset applied to coordinates so they pack into 32 bits each.
+OFFSET = 1 << 31
+
+
+def pack(row, col):
+    "Pack a position into a single 64 bit integer."
+    return ((row + OFFSET) << 32) | (col + OFFSET)
+
+
+def unpack(key):
+    "Return the (row, col) packed into key."
+    return (key >> 32) - OFFSET, (key & 0xFFFFFFFF) - OFFSET
+
+
+class Rope:
+    """
+    Rope with any number of knots.  Knot positions are kept in flat
+    integer arrays and the cells visited by every knot are recorded as
+    packed integers, so one simulation answers the question for any
+    knot.
+    """
+
+    def __init__(self, knots=10):
+        self.rows = array.array('q', [0] * knots)
+        self.cols = array.array('q', [0] * knots)
+        self.visited = [{pack(0, 0)} for _ in range(knots)]
+
+    def step(self, dr, dc):
+        "Move the head one step and let the rest of the rope follow."
+        rows, cols, visited = self.rows, self.cols, self.visited
+        rows[0] += dr
+        cols[0] += dc
+        visited[0].add(pack(rows[0], cols[0]))
+        for i in range(1, len(rows)):
+            dr = rows[i-1] - rows[i]
+            dc = cols[i-1] - cols[i]
+            if -1 <= dr <= 1 and -1 <= dc <= 1:
+                continue
+            rows[i] += sign(dr)
+            cols[i] += sign(dc)
+            visited[i].add(pack(rows[i], cols[i]))
+
+    def move(self, dirn, repeat):
+        "Move the head repeat steps in the given direction (L,R,U,D)."
+        dr, dc = DIRNS[dirn]
+        for _ in range(repeat):
+            self.step(dr, dc)
+
+    def run(self, instructions):
+        "Run all instructions and return the rope."
+        for dirn, repeat in instructions:
+            self.move(dirn, repeat)
+        return self
+
+    def visited_counts(self):
+        "Return the number of cells visited by each knot."
+        return [len(v) for v in self.visited]
+
+
+class FastRope(Rope):
+    """
+    Rope that stops propagating a step at the first knot that does not
+    move, and that advances a straight rope many steps at once.
+    """
+
+    def step(self, dr, dc):
+        """
+        Move the head one step and let the rest of the rope follow.
+        Return True if the tail moved.
+        """
+        rows, cols, visited = self.rows, self.cols, self.visited
+        rows[0] += dr
+        cols[0] += dc
+        visited[0].add(pack(rows[0], cols[0]))
+        for i in range(1, len(rows)):
+            dr = rows[i-1] - rows[i]
+            dc = cols[i-1] - cols[i]
+            if -1 <= dr <= 1 and -1 <= dc <= 1:
+                # No knot behind this one can move either.
+                return False
+            rows[i] += sign(dr)
+            cols[i] += sign(dc)
+            visited[i].add(pack(rows[i], cols[i]))
+        return True
+
+    def is_straight(self, dr, dc):
+        "Return True if every knot is one step behind the one ahead of it."
+        rows, cols = self.rows, self.cols
+        return all(
+            rows[i-1] - rows[i] == dr and cols[i-1] - cols[i] == dc
+            for i in range(1, len(rows))
+        )
+
+    def advance(self, dr, dc, repeat):
+        "Move a straight rope repeat steps in one go."
+        # Consecutive cells along a row or column differ by a constant
+        # once packed, so each knot's new cells form a range.
+        delta = (dr << 32) + dc
+        for i, visited in enumerate(self.visited):
+            start = pack(self.rows[i], self.cols[i])
+            visited.update(range(start + delta, start + delta * (repeat + 1),
+                                 delta))
+            self.rows[i] += dr * repeat
+            self.cols[i] += dc * repeat
+
+    def move(self, dirn, repeat):
+        "Move the head repeat steps in the given direction (L,R,U,D)."
+        dr, dc = DIRNS[dirn]
+        tail_moved = True
+        while repeat > 0:
+            # A rope is only worth checking once its tail is moving.
+            if tail_moved and self.is_straight(dr, dc):
+                self.advance(dr, dc, repeat)
+                return
+            tail_moved = self.step(dr, dc)
+            repeat -= 1
+
+
+def solve(instructions, knots=10, rope_type=FastRope):
+    """
+    Solve parts A and B of puzzle in a single simulation.  Part A is the
+    knot behind the head, so the rope needs at least two knots.
+    """
+    if knots < 2:
+        raise ValueError(f"solve() needs at least 2 knots, not {knots}.")
+    counts = rope_type(knots).run(instructions).visited_counts()
+    return counts[1], counts[-1]
+
+
 #
 # Testing
 #
@@ -137,6 +267,40 @@ def test_solve_b():
     assert soln_b == 36
 
 
+def test_rope():
+    for test_file in ('../test1.txt', '../test2.txt'):
+        instructions = read_input(test_file)
+        expected = solve_a(instructions), solve_b(instructions)
+        assert solve(instructions, rope_type=Rope) == expected
+        assert solve(instructions, rope_type=FastRope) == expected
+
+
+def test_solve_knots():
+    instructions = read_input('../test1.txt')
+    assert solve(instructions, knots=2) == (13, 13)
+    try:
+        solve(instructions, knots=1)
+    except ValueError:
+        pass
+    else:
+        assert False, "solve() accepted a single knot"
+
+
+def test_fast_rope():
+    instructions = [
+        ('R', 30), ('U', 25), ('L', 1000), ('D', 3), ('L', 40),
+        ('D', 500), ('R', 2), ('U', 17), ('R', 700)
+    ]
+    for knots in (1, 2, 3, 10):
+        rope = Rope(knots).run(instructions)
+        fast_rope = FastRope(knots).run(instructions)
+        assert fast_rope.visited == rope.visited
+        assert fast_rope.rows == rope.rows
+        assert fast_rope.cols == rope.cols
+    for posn in ((0, 0), (-5, 7), (3, -11), (-2**31, 2**31 - 1)):
+        assert unpack(pack(*posn)) == posn
+
+
 #
 # Main
 #
@@ -146,10 +310,9 @@ def main():
     "Main program."
     import pyperclip
     instructions = read_input('../input09.txt')
-    soln_a = solve_a(instructions)
+    soln_a, soln_b = solve(instructions)
     assert soln_a == 6098
     print(f"The solution to part A is {soln_a}.")
-    soln_b = solve_b(instructions)
     assert soln_b == 2597
     print(f"The solution to part B is {soln_b}.")
     pyperclip.copy(str(soln_b))
@@ -4,35 +4,81 @@ Day 10: Cathode-Ray Tube
 jramaswami
 """
 
+import array
+import bisect
+
+
+NOOP = 0
+ADDX = 1
+
+# Number of cycles each opcode takes.
+CYCLES = {NOOP: 1, ADDX: 2}
+
+
+def decode(instructions):
+    "Decode instructions once into parallel opcode and operand arrays."
+    opcodes = bytearray()
+    operands = array.array('q')
+    for instruction in instructions:
+        tokens = instruction.split()
+        if not tokens:
+            continue
+        if tokens[0] == 'noop':
+            opcodes.append(NOOP)
+            operands.append(0)
+        else:
+            opcodes.append(ADDX)
+            operands.append(int(tokens[1]))
+    return opcodes, operands
 
 
 class VM:
 
     def __init__(self, instructions):
-        self.instructions = instructions
+        self.opcodes, self.operands = decode(instructions)
         self.register = 1
-        self.cycles = [self.register]
-
-    def noop(self):
-        self.cycles.append(self.register)
-
-    def addx(self, val):
-        self.cycles.append(self.register)
-        self.cycles.append(self.register)
-        self.register += val
+        # The register trace as run-length segments: the register holds
+        # values[i] from cycle starts[i] until the next segment starts.
+        self.starts = array.array('q', [0])
+        self.values = array.array('q', [self.register])
+        self.last_cycle = 0
 
     def run(self):
-        for instruction in self.instructions:
-            tokens = instruction.strip().split()
-            if tokens[0] == 'noop':
-                self.noop()
-            else:
-                self.addx(int(tokens[1]))
+        cycle = self.last_cycle
+        for opcode, operand in zip(self.opcodes, self.operands):
+            cycle += CYCLES[opcode]
+            if opcode == ADDX and operand:
+                self.register += operand
+                self.starts.append(cycle + 1)
+                self.values.append(self.register)
+        self.last_cycle = cycle
+
+    def iter_cycles(self):
+        """
+        Yield (cycle, register) for every cycle of the program, starting
+        at cycle one, without recording the trace.
+        """
+        register = 1
+        cycle = 0
+        for opcode, operand in zip(self.opcodes, self.operands):
+            for _ in range(CYCLES[opcode]):
+                cycle += 1
+                yield cycle, register
+            if opcode == ADDX:
+                register += operand
+
+    def value_at(self, cycle):
+        "Return the value of the register during the given cycle."
+        return self.values[bisect.bisect_right(self.starts, cycle) - 1]
+
+    @property
+    def cycles(self):
+        "Return the register value for every cycle, starting at zero."
+        return [self.value_at(c) for c in range(self.last_cycle + 1)]
 
     def solve_a(self):
-        soln_a = 0
         cs = [20, 60, 100, 140, 180, 220]
-        return sum(c * self.cycles[c] for c in cs)
+        return sum(c * self.value_at(c) for c in cs)
 
 
 class CRT:
@@ -50,6 +96,39 @@ class CRT:
         return "\n".join("".join(row) for row in self.image)
 
 
+class StreamingCRT:
+    """
+    CRT that draws (cycle, register) pairs into a bytearray framebuffer
+    one pixel at a time, emitting each row as soon as it is complete.
+    When the last row is finished drawing starts again at the top.
+    """
+
+    def __init__(self, width=40, height=6):
+        self.width = width
+        self.height = height
+        self.framebuffer = bytearray(b'.' * (width * height))
+
+    def draw(self, cycles):
+        "Draw the given cycles and yield each row as it is completed."
+        width = self.width
+        size = len(self.framebuffer)
+        for cycle, register in cycles:
+            posn = (cycle - 1) % size
+            c = posn % width
+            self.framebuffer[posn] = (
+                ord('#') if c - 1 <= register <= c + 1 else ord('.')
+            )
+            if c == width - 1:
+                start = posn - c
+                yield self.framebuffer[start:start+width].decode()
+
+    def __str__(self):
+        return "\n".join(
+            self.framebuffer[r:r+self.width].decode()
+            for r in range(0, len(self.framebuffer), self.width)
+        )
+
+
 def read_instructions(filename):
     "Read instructions from input file."
     instructions = []
@@ -88,6 +167,32 @@ def test_solve_a():
     assert vm.solve_a() == expected
 
 
+def test_segments():
+    instructions = read_instructions('../test1.txt')
+    vm = VM(instructions)
+    vm.run()
+    assert list(vm.starts) == [0, 4, 6]
+    assert list(vm.values) == [1, 4, -1]
+    assert list(vm.opcodes) == [NOOP, ADDX, ADDX]
+    assert list(vm.operands) == [0, 3, -5]
+    # Sampling past the end of the program sees the final register.
+    assert vm.value_at(10 ** 12) == -1
+
+
+def test_streaming_crt():
+    instructions = read_instructions('../test2.txt')
+    vm = VM(instructions)
+    vm.run()
+    assert list(vm.iter_cycles()) == list(enumerate(vm.cycles))[1:]
+    crt = StreamingCRT()
+    rows = list(crt.draw(vm.iter_cycles()))
+    assert rows == str(CRT(vm.cycles)).split("\n")
+    assert str(crt) == str(CRT(vm.cycles))
+    # A smaller display wraps around into new frames.
+    crt = StreamingCRT(40, 2)
+    assert list(crt.draw(vm.iter_cycles())) == rows
+
+
 #
 # Main
 #
@@ -102,8 +207,10 @@ def main():
     soln_a = vm.solve_a()
     assert soln_a == 16480
     print(f"The solution to part A is {soln_a}.")
-    crt = CRT(vm.cycles)
-    print(f"\n{crt}\n")
+    print()
+    for row in StreamingCRT().draw(vm.iter_cycles()):
+        print(row)
+    print()
     soln_b = "PLEFULPB"
     assert soln_b == 'PLEFULPB'
     print(f"The solution to part B is {soln_b}.")
@@ -14,6 +14,12 @@ import operator
 import os
 
 
+# Opcodes for a monkey's operation.
+ADD = 0
+MUL = 1
+SQUARE = 2
+
+
 @dataclass
 class Monkey:
     "Class representing a monkey."
@@ -24,6 +30,8 @@ class Monkey:
     falsemonkey: int
     divisor: int
     inspected: int = 0
+    opcode: Optional[int] = None
+    operand: Optional[int] = None
 
 
 def parse_input(filename):
@@ -48,8 +56,11 @@ def parse_input(filename):
             operation = None
             if tokens[-3] == 'old' and tokens[-2] == '*' and tokens[-1] == 'old':
                 operation = operations['square']
+                opcode, operand = SQUARE, 0
             else:
                 operation = functools.partial(operations[tokens[-2]], int(tokens[-1]))
+                opcode = ADD if tokens[-2] == '+' else MUL
+                operand = int(tokens[-1])
             # Parse test.
             tokens = lines[3].split()
             divisor = int(tokens[-1])
@@ -58,13 +69,14 @@ def parse_input(filename):
             truemonkey = int(lines[4].split()[-1])
             falsemonkey = int(lines[5].split()[-1])
 
-            monkeys.append(Monkey(items, operation, test, truemonkey, falsemonkey, divisor))
+            monkeys.append(Monkey(items, operation, test, truemonkey, falsemonkey, divisor,
+                                  opcode=opcode, operand=operand))
 
     return monkeys
 
 
 def tick(monkeys, reduceworry=True, verbose=False):
-    "Simulate one tick."
+    "Simulate one tick, optionally tracing every step."
     MOD = functools.reduce(operator.mul, (m.divisor for m in monkeys), 1)
     for i, monkey in enumerate(monkeys):
         if verbose:
@@ -91,10 +103,48 @@ def tick(monkeys, reduceworry=True, verbose=False):
                 monkeys[monkey.falsemonkey].items.append(item % MOD)
 
 
+def apply_operation(opcode, operand, items, reduceworry, MOD):
+    "Apply an operation to a whole queue of items at once."
+    if opcode == ADD:
+        items = [x + operand for x in items]
+    elif opcode == MUL:
+        items = [x * operand for x in items]
+    else:
+        items = [x * x for x in items]
+    if reduceworry:
+        return [x // 3 % MOD for x in items]
+    return [x % MOD for x in items]
+
+
 def simulate(monkeys, ticks, reduceworry=True):
-    "Simulate for the given number of ticks."
+    """
+    Simulate for the given number of ticks.  Each monkey's queue is
+    processed as one batch per tick; use tick() for a traced run.
+    """
+    MOD = functools.reduce(operator.mul, (m.divisor for m in monkeys), 1)
+    for i, monkey in enumerate(monkeys):
+        if monkey.opcode is None or monkey.operand is None:
+            raise ValueError(f"Monkey {i} has no compiled operation.")
+    program = [
+        (m.opcode, m.operand, m.divisor, m.truemonkey, m.falsemonkey)
+        for m in monkeys
+    ]
+    queues = [list(m.items) for m in monkeys]
+    inspected = [0] * len(monkeys)
     for _ in range(ticks):
-        tick(monkeys, reduceworry=reduceworry)
+        for i, compiled in enumerate(program):
+            opcode, operand, divisor, truemonkey, falsemonkey = compiled
+            items = queues[i]
+            if not items:
+                continue
+            queues[i] = []
+            inspected[i] += len(items)
+            items = apply_operation(opcode, operand, items, reduceworry, MOD)
+            queues[truemonkey].extend([x for x in items if x % divisor == 0])
+            queues[falsemonkey].extend([x for x in items if x % divisor])
+    for monkey, queue, count in zip(monkeys, queues, inspected):
+        monkey.items = collections.deque(queue)
+        monkey.inspected += count
 
 
 def solve_a(monkeys):
@@ -110,6 +160,81 @@ def solve_b(monkeys):
     m1, m2 = sorted([m.inspected for m in monkeys], reverse=True)[:2]
     return m1 * m2
 
+
+def item_round(monkeys, owner, worry, MOD):
+    """
+    Follow a single item through one round without worry reduction.
+    Return its new (owner, worry) and the monkeys that inspected it.
+    """
+    inspectors = []
+    while True:
+        monkey = monkeys[owner]
+        inspectors.append(owner)
+        worry = monkey.operation(worry) % MOD
+        target = (
+            monkey.truemonkey if monkey.test(worry) == 0
+            else monkey.falsemonkey
+        )
+        if target < owner:
+            # Monkey target has already had its turn this round.
+            return target, worry, inspectors
+        owner = target
+
+
+def item_inspections(monkeys, owner, worry, rounds, MOD):
+    """
+    Return how many times each monkey inspects one item over the given
+    number of rounds.  Without worry reduction the item's (owner, worry)
+    state must repeat, so once a cycle is found the remaining rounds are
+    extrapolated from it.
+    """
+    seen = {}
+    # totals[r] is the inspection count per monkey after r rounds.
+    totals = [[0] * len(monkeys)]
+    state = (owner, worry)
+    while state not in seen:
+        if len(totals) - 1 == rounds:
+            return totals[-1]
+        seen[state] = len(totals) - 1
+        owner, worry, inspectors = item_round(monkeys, *state, MOD)
+        counts = list(totals[-1])
+        for i in inspectors:
+            counts[i] += 1
+        totals.append(counts)
+        state = (owner, worry)
+    start = seen[state]
+    length = len(totals) - 1 - start
+    cycles, remainder = divmod(rounds - start, length)
+    return [
+        totals[start][i] +
+        cycles * (totals[start + length][i] - totals[start][i]) +
+        totals[start + remainder][i] - totals[start][i]
+        for i in range(len(monkeys))
+    ]
+
+
+def fast_forward(monkeys, rounds):
+    """
+    Simulate the given number of rounds without worry reduction by
+    tracking each item separately.  Updates the monkeys' inspected counts
+    but not their items.
+    """
+    MOD = functools.reduce(operator.mul, (m.divisor for m in monkeys), 1)
+    for owner, monkey in enumerate(monkeys):
+        for worry in monkey.items:
+            counts = item_inspections(monkeys, owner, worry % MOD, rounds,
+                                      MOD)
+            for m, count in zip(monkeys, counts):
+                m.inspected += count
+
+
+def solve_b_fast(monkeys, rounds=10000):
+    "Solve part B of puzzle using per-item cycle detection."
+    fast_forward(monkeys, rounds)
+    m1, m2 = sorted([m.inspected for m in monkeys], reverse=True)[:2]
+    return m1 * m2
+
+
 #
 # Testing
 #
@@ -140,6 +265,30 @@ def test_1():
             assert result == expected
 
 
+def test_simulate():
+    for reduceworry in (True, False):
+        expected = parse_input('../test.txt')
+        monkeys = parse_input('../test.txt')
+        for _ in range(50):
+            tick(expected, reduceworry=reduceworry)
+            simulate(monkeys, 1, reduceworry=reduceworry)
+            assert [m.items for m in monkeys] == [m.items for m in expected]
+            assert [m.inspected for m in monkeys] == [
+                m.inspected for m in expected
+            ]
+
+
+def test_uncompiled_monkey():
+    monkeys = parse_input('../test.txt')
+    monkeys[0].opcode = None
+    try:
+        simulate(monkeys, 1)
+    except ValueError:
+        pass
+    else:
+        assert False, "simulate() ran a monkey without an opcode"
+
+
 def test_2():
     monkeys = parse_input('../test.txt')
     simulate(monkeys, 20)
@@ -161,6 +310,18 @@ def test_solve_b():
     assert result == expected
 
 
+def test_fast_forward():
+    for rounds in (1, 20, 1000, 10000):
+        monkeys = parse_input('../test.txt')
+        simulate(monkeys, rounds, reduceworry=False)
+        expected = [m.inspected for m in monkeys]
+        monkeys = parse_input('../test.txt')
+        fast_forward(monkeys, rounds)
+        assert [m.inspected for m in monkeys] == expected
+    monkeys = parse_input('../test.txt')
+    assert solve_b_fast(monkeys) == 2713310158
+
+
 #
 # Main
 #
@@ -174,7 +335,7 @@ def main():
     print(f"The solution to part A is {soln_a}.")
 
     monkeys = parse_input('../input11.txt')
-    soln_b = solve_b(monkeys)
+    soln_b = solve_b_fast(monkeys)
     assert soln_b == 14399640002
     print(f"The solution to part B is {soln_b}.")
     pyperclip.copy(str(soln_b))
@@ -33,6 +33,14 @@ def find_start(grid):
                 return r, c
 
 
+def find_end(grid):
+    "Find the ending point."
+    for r, row in enumerate(grid):
+        for c, code in enumerate(row):
+            if code == 'E':
+                return r, c
+
+
 def find_zero_elevations(grid):
     "Generator to yield all positions with zero elevation."
     for r, row in enumerate(grid):
@@ -79,15 +87,45 @@ def bfs(init_r, init_c, grid):
     return math.inf
 
 
-def solve_a(grid):
+def distances_to_end(grid):
+    """
+    Return a grid holding the minimum number of steps from every cell to
+    the end (math.inf if the end cannot be reached).  A single BFS runs
+    backwards from the end, where a step back from a cell is allowed if
+    the cell is at most 1 higher than the one stepped to.
+    """
+    heights = [[get_height(code) for code in row] for row in grid]
+    dist = [[math.inf for _ in row] for row in grid]
+    end_r, end_c = find_end(grid)
+    dist[end_r][end_c] = 0
+    queue = collections.deque([(end_r, end_c)])
+    while queue:
+        r, c = queue.popleft()
+        d = dist[r][c] + 1
+        h = heights[r][c]
+        for r0, c0 in ((r+1, c), (r-1, c), (r, c+1), (r, c-1)):
+            if (
+                0 <= r0 < len(grid) and 0 <= c0 < len(grid[r0]) and
+                dist[r0][c0] == math.inf and h - heights[r0][c0] <= 1
+            ):
+                dist[r0][c0] = d
+                queue.append((r0, c0))
+    return dist
+
+
+def solve_a(grid, dist=None):
     "Solve part A of puzzle."
+    if dist is None:
+        dist = distances_to_end(grid)
     init_r, init_c = find_start(grid)
-    return bfs(init_r, init_c, grid)
+    return dist[init_r][init_c]
 
 
-def solve_b(grid):
+def solve_b(grid, dist=None):
     "Solve part B of puzzle."
-    return min(bfs(r, c, grid) for r, c in find_zero_elevations(grid))
+    if dist is None:
+        dist = distances_to_end(grid)
+    return min(dist[r][c] for r, c in find_zero_elevations(grid))
 
 
 #
@@ -107,6 +145,16 @@ def test_solve_b():
     assert solve_b(grid) == expected
 
 
+def test_distances_to_end():
+    grid = read_input('../test.txt')
+    dist = distances_to_end(grid)
+    for r, row in enumerate(grid):
+        for c, _ in enumerate(row):
+            assert dist[r][c] == bfs(r, c, grid)
+    assert solve_a(grid, dist) == 31
+    assert solve_b(grid, dist) == 29
+
+
 #
 # Main
 #
@@ -116,10 +164,11 @@ def main():
     "Main program."
     import pyperclip
     grid = read_input('../input12.txt')
-    soln_a = solve_a(grid)
+    dist = distances_to_end(grid)
+    soln_a = solve_a(grid, dist)
     assert soln_a == 449
     print(f"The solution to part A is {soln_a}.")
-    soln_b = solve_b(grid)
+    soln_b = solve_b(grid, dist)
     assert soln_b == 443
     print(f"The solution to part B is {soln_b}.")
     pyperclip.copy(str(soln_b))